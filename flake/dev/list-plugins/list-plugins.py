@@ -1,9 +1,11 @@
-import glob
 import os
 import re
+import sys
 from argparse import ArgumentParser, RawTextHelpFormatter
+from collections.abc import Iterator
 from dataclasses import dataclass
 from enum import Enum
+from functools import cache
 from typing import Optional
 
 # Ignore files that are not plugin definitions
@@ -42,6 +44,9 @@ EXCLUDES: list[str] = [
     "plugins/lsp/language-servers/",
     "plugins/lsp/lsp-packages.nix",
 ]
+EXCLUDE_RE: re.Pattern = re.compile("|".join(map(re.escape, EXCLUDES)))
+# Directories whose whole subtree is excluded, so the walker can skip them
+EXCLUDE_DIRS: frozenset[str] = frozenset(p for p in EXCLUDES if p.endswith("/"))
 
 
 class Kind(Enum):
@@ -56,6 +61,13 @@ class State(Enum):
     OLD = "❌"
 
 
+KIND_ICONS: dict[Kind, str] = {
+    Kind.NEOVIM: "\033[94m" + " ",
+    Kind.VIM: "\033[92m" + " ",
+    Kind.MISC: "\033[92m" + "🟢",
+}
+
+
 KNOWN_PATHS: dict[
     str,
     tuple[
@@ -99,18 +111,17 @@ for telescope_extension_name, has_depr_warnings in {
     )
 
 
-DEPRECATION_REGEX: list[re.Pattern] = [
-    re.compile(rf".*{pattern}", re.DOTALL)
-    for pattern in [
-        "deprecateExtra",
-        "mkRemovedOptionModule",
-        "mkRenamedOptionModule",
-        "optionsRenamedToSettings",
-    ]
-]
+DEPRECATION_TOKENS: tuple[bytes, ...] = (
+    b"deprecateExtra",
+    b"mkRemovedOptionModule",
+    b"mkRenamedOptionModule",
+    b"optionsRenamedToSettings",
+)
+
+REQUIRE_SETUP_RE: re.Pattern = re.compile(rb"require.+setup", re.DOTALL)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Plugin:
     path: str
     state: State
@@ -118,68 +129,47 @@ class Plugin:
     dep_warnings: bool
 
     def __str__(self) -> str:
-        state_icon: str = self.state.value
-        kind_icon: str
-        match self.kind:
-            case Kind.NEOVIM:
-                kind_icon = "\033[94m" + " "
-            case Kind.VIM:
-                kind_icon = "\033[92m" + " "
-            case Kind.MISC:
-                kind_icon = "\033[92m" + "🟢"
-            case _:
-                assert False
-        deprecation_icon: str = "⚠️ " if self.dep_warnings else "  "
-
         return (
-            f"| {kind_icon}\033[0m  | {state_icon}  | {deprecation_icon} | {self.path}"
+            f"| {KIND_ICONS[self.kind]}\033[0m  | {self.state.value}  "
+            f"| {'⚠️ ' if self.dep_warnings else '  '} | {self.path}"
         )
 
-    def print_markdown(self) -> None:
-        print(f"- [ ] {self.path} ({self.kind.name.lower()})")
+    def to_markdown(self) -> str:
+        return f"- [ ] {self.path} ({self.kind.name.lower()})"
 
 
-def has_deprecation_warnings(string: str) -> bool:
-    for regex in DEPRECATION_REGEX:
-        if re.match(regex, string):
-            return True
-    return False
+@cache
+def known_plugins(root_path: str) -> dict[str, Plugin]:
+    # Built once per root, keyed by the paths `walk_nix` yields under it
+    plugins: dict[str, Plugin] = {}
+    for known_path, (state, kind, dep_warnings) in KNOWN_PATHS.items():
+        path: str = os.path.join(root_path, known_path)
+        plugins[path] = Plugin(path, state, kind, dep_warnings)
+    return plugins
 
 
-def parse_file(path: str) -> Optional[Plugin]:
-    file_content: str = ""
-    with open(path, "r") as f:
-        file_content = f.read()
+def has_deprecation_warnings(string: bytes) -> bool:
+    return any(token in string for token in DEPRECATION_TOKENS)
+
+
+def parse_file(root_path: str, path: str) -> Optional[Plugin]:
+    known: Optional[Plugin] = known_plugins(root_path).get(path)
+    if known is not None:
+        return known
 
-    known_path: str
-    props: tuple[State, Kind, bool]
-    for known_path, props in KNOWN_PATHS.items():
-        if known_path in path:
-            return Plugin(
-                path=path,
-                state=props[0],
-                kind=props[1],
-                dep_warnings=props[2],
-            )
+    file_content: bytes = b""
+    with open(path, "rb") as f:
+        file_content = f.read()
 
     state: State = State.UNKNOWN
     kind: Kind
-    if re.match(
-        re.compile(r".*mkNeovimPlugin", re.DOTALL),
-        file_content,
-    ):
+    if b"mkNeovimPlugin" in file_content:
         kind = Kind.NEOVIM
         state = State.NEW
-    elif re.match(
-        re.compile(r".*require.+setup", re.DOTALL),
-        file_content,
-    ):
+    elif REQUIRE_SETUP_RE.search(file_content):
         kind = Kind.NEOVIM
         state = State.OLD
-    elif re.match(
-        re.compile(r".*mkVimPlugin", re.DOTALL),
-        file_content,
-    ):
+    elif b"mkVimPlugin" in file_content:
         kind = Kind.VIM
         state = State.NEW
     else:
@@ -196,36 +186,58 @@ def parse_file(path: str) -> Optional[Plugin]:
 
 
 def _is_excluded(path: str) -> bool:
-    for exclude_pattern in EXCLUDES:
-        if exclude_pattern in path:
-            return False
-    return True
+    return EXCLUDE_RE.search(path) is not None
 
 
-def main(args) -> None:
-    pathname: str = os.path.join(args.root_path, "plugins/**/*.nix")
-    paths: list[str] = glob.glob(pathname=pathname, recursive=True)
-    filtered_paths: list[str] = list(filter(_is_excluded, paths))
-    filtered_paths.sort()
+def walk_nix(root: str) -> Iterator[str]:
+    entry: os.DirEntry
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                dir_path: str = entry.path + "/"
+                if not any(exclude in dir_path for exclude in EXCLUDE_DIRS):
+                    yield from walk_nix(entry.path)
+            elif entry.name.endswith(".nix") and entry.is_file():
+                yield entry.path
 
-    if not args.markdown:
-        print("| Typ | Sty | DW | path")
-        print(
-            "|-----|-----|----|--------------------------------------------------------"
-        )
 
-    for plugin_path in filtered_paths:
-        plugin: Optional[Plugin] = parse_file(path=plugin_path)
+def main(args) -> None:
+    kept_paths: Iterator[str] = (
+        path
+        for path in walk_nix(os.path.join(args.root_path, "plugins"))
+        if not _is_excluded(path)
+    )
+
+    # Parse and filter as paths are walked; only the kept rows get sorted
+    rows: list[tuple[str, str]] = []
+    path: str
+    plugin: Optional[Plugin]
+    for path in kept_paths:
+        plugin = parse_file(root_path=args.root_path, path=path)
         if plugin is not None:
             if (
-                (args.kind is None or plugin.kind.name.lower() == args.kind)
-                and (args.state is None or plugin.state.name.lower() == args.state)
+                (args.kind is None or plugin.kind is args.kind)
+                and (args.state is None or plugin.state is args.state)
                 and (not args.deprecation_warnings or plugin.dep_warnings)
             ):
-                if args.markdown:
-                    plugin.print_markdown()
-                else:
-                    print(plugin)
+                rows.append(
+                    (path, plugin.to_markdown() if args.markdown else str(plugin))
+                )
+    rows.sort()
+
+    # Accumulate the output and write it at once instead of printing per line
+    out: list[str] = []
+    if not args.markdown:
+        out.append("| Typ | Sty | DW | path")
+        out.append(
+            "|-----|-----|----|--------------------------------------------------------"
+        )
+    out.extend(line for _, line in rows)
+
+    if out:
+        sys.stdout.write("\n".join(out) + "\n")
 
 
 if __name__ == "__main__":
@@ -271,4 +283,9 @@ if __name__ == "__main__":
         help="Markdown output",
     )
 
-    main(parser.parse_args())
+    args = parser.parse_args()
+    # Compare enum members directly instead of their lowercased names
+    args.kind = Kind[args.kind.upper()] if args.kind else None
+    args.state = State[args.state.upper()] if args.state else None
+
+    main(args)